@@ -2,15 +2,23 @@ import dbus
 import dbus.service
 import dbus.mainloop.glib
 from gi.repository import GLib
+import ctypes
+import errno
 import time
-import pygame
+import select
 import signal
+import socket
 import sys
 import os
 import random
 import subprocess
 import logging
 import re
+import threading
+
+from evdev import InputDevice, ecodes, list_devices
+
+from mousecontroller import uring
 
 # Configure logging
 logging.basicConfig(
@@ -19,51 +27,158 @@ logging.basicConfig(
 )
 logger = logging.getLogger('BT_HID_Mouse')
 
-# Standard mouse HID descriptor
-MOUSE_DESCRIPTOR = bytes([
-    0x05, 0x01,        # Usage Page (Generic Desktop)
-    0x09, 0x02,        # Usage (Mouse)
-    0xA1, 0x01,        # Collection (Application)
-    0x09, 0x01,        #   Usage (Pointer)
-    0xA1, 0x00,        #   Collection (Physical)
-    0x05, 0x09,        #     Usage Page (Button)
-    0x19, 0x01,        #     Usage Minimum (1)
-    0x29, 0x03,        #     Usage Maximum (3)
-    0x15, 0x00,        #     Logical Minimum (0)
-    0x25, 0x01,        #     Logical Maximum (1)
-    0x95, 0x03,        #     Report Count (3)
-    0x75, 0x01,        #     Report Size (1)
-    0x81, 0x02,        #     Input (Data,Var,Abs)
-    0x95, 0x01,        #     Report Count (1)
-    0x75, 0x05,        #     Report Size (5)
-    0x81, 0x01,        #     Input (Const,Array,Abs)
-    0x05, 0x01,        #     Usage Page (Generic Desktop)
-    0x09, 0x30,        #     Usage (X)
-    0x09, 0x31,        #     Usage (Y)
-    0x15, 0x81,        #     Logical Minimum (-127)
-    0x25, 0x7F,        #     Logical Maximum (127)
-    0x75, 0x08,        #     Report Size (8)
-    0x95, 0x02,        #     Report Count (2)
-    0x81, 0x06,        #     Input (Data,Var,Rel)
-    0xC0,              #   End Collection
-    0xC0               # End Collection
-])
+# Bluetooth MAC address, compiled once; non-capturing so a match builds
+# no group objects
+_MAC_RE = re.compile(r'(?:[0-9A-Fa-f]{2}:){5}[0-9A-Fa-f]{2}')
+
+# One HID report per Bluetooth connection interval (~7.5-11.25 ms); more
+# frequent sends would only queue up in the interrupt channel
+REPORT_INTERVAL_NS = 8_000_000
+
+# evdev button codes -> HID button bits (bit0=left, bit1=right, bit2=middle)
+BUTTON_MASKS = {
+    ecodes.BTN_LEFT: 0x01,
+    ecodes.BTN_RIGHT: 0x02,
+    ecodes.BTN_MIDDLE: 0x04,
+}
+
+# HID-over-L2CAP channels and framing
+PSM_CTRL = 0x11
+PSM_INTR = 0x13
+HIDP_INPUT_REPORT = 0xA1  # HIDP DATA | INPUT_REPORT
+
+
+def _pack_report(dx, dy, buttons, out):
+    """Clamp deltas and write the 3 payload bytes after the HIDP header.
+
+    Kept free of Python-object tricks so numba can lower it to a handful
+    of native instructions when available.
+    """
+    dx = dx if -128 < dx < 128 else (127 if dx > 0 else -127)
+    dy = dy if -128 < dy < 128 else (127 if dy > 0 else -127)
+    out[1] = buttons
+    out[2] = dx & 0xFF
+    out[3] = dy & 0xFF
+
+
+try:
+    import numpy
+    from numba import njit
+except ImportError:
+    numpy = None
+else:
+    # nogil so packing can overlap with send completions on another thread
+    _pack_report = njit(cache=True, nogil=True)(_pack_report)
+
+# Real-time tuning for the input->HID path
+RT_PRIORITY = 20
+MCL_CURRENT = 1
+MCL_FUTURE = 2
+TIMER_ABSTIME = 1
+
+
+class _timespec(ctypes.Structure):
+    _fields_ = [('tv_sec', ctypes.c_long), ('tv_nsec', ctypes.c_long)]
+
+
+try:
+    _clock_nanosleep = ctypes.CDLL('libc.so.6', use_errno=True).clock_nanosleep
+except (OSError, AttributeError):
+    _clock_nanosleep = None
+
+
+def sleep_until(deadline_ns):
+    """Sleep until an absolute CLOCK_MONOTONIC deadline in nanoseconds.
+
+    clock_nanosleep with TIMER_ABSTIME does not drift: a late wakeup or
+    an interrupting signal never pushes the deadline further out, unlike
+    chained relative time.sleep() calls.
+    """
+    if _clock_nanosleep is not None:
+        ts = _timespec(deadline_ns // 1_000_000_000, deadline_ns % 1_000_000_000)
+        while _clock_nanosleep(
+            time.CLOCK_MONOTONIC, TIMER_ABSTIME, ctypes.byref(ts), None
+        ) == errno.EINTR:
+            pass  # resume sleeping toward the same absolute deadline
+        return
+    remaining = deadline_ns - time.monotonic_ns()
+    if remaining > 0:
+        time.sleep(remaining / 1e9)
+
+
+def enable_realtime():
+    """Best effort: SCHED_FIFO scheduling and locked memory pages.
+
+    A preempted or paged-out capture loop adds milliseconds of jitter to
+    HID reports; both knobs need root, which main() already requires.
+    """
+    try:
+        os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(RT_PRIORITY))
+        logger.info(f"Enabled SCHED_FIFO scheduling (priority {RT_PRIORITY})")
+    except OSError as e:
+        logger.warning(f"Could not enable SCHED_FIFO scheduling: {e}")
+    try:
+        libc = ctypes.CDLL('libc.so.6', use_errno=True)
+        if libc.mlockall(MCL_CURRENT | MCL_FUTURE) != 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+        logger.info("Locked process memory (mlockall)")
+    except OSError as e:
+        logger.warning(f"Could not lock process memory: {e}")
+
+
+class HIDProfile(dbus.service.Object):
+    """org.bluez.Profile1 implementation receiving the HID channel fds.
+
+    BlueZ establishes the L2CAP channels itself and hands each one over
+    as a unix fd, so the data path never touches DBus: the fd becomes a
+    plain socket and reports go out with a single send() on it.
+    """
+
+    def __init__(self, bus, path, service):
+        super().__init__(bus, path)
+        self.service = service
+
+    @dbus.service.method('org.bluez.Profile1',
+                         in_signature='', out_signature='')
+    def Release(self):
+        logger.info("HID profile released by BlueZ")
+
+    @dbus.service.method('org.bluez.Profile1',
+                         in_signature='oha{sv}', out_signature='')
+    def NewConnection(self, device, fd, fd_properties):
+        fd = fd.take()
+        sock = socket.fromfd(
+            fd, socket.AF_BLUETOOTH, socket.SOCK_SEQPACKET,
+            socket.BTPROTO_L2CAP
+        )
+        os.close(fd)  # fromfd dups, the original is no longer needed
+        self.service.add_channel(device, sock)
+
+    @dbus.service.method('org.bluez.Profile1',
+                         in_signature='o', out_signature='')
+    def RequestDisconnection(self, device):
+        logger.info(f"Disconnection requested for {device}")
+        self.service._close_client_sockets()
+
 
 class BTHIDMouseService:
     BUS_NAME = 'org.bluez'
+    ADAPTER_PATH = '/org/bluez/hci0'
     BASE_HID_UUID = '00001124-0000-1000-8000-00805f9b34fb'  # Base HID UUID
 
     def __init__(self):
         # Generate unique identifiers
         self.pid = os.getpid()
         self.random_suffix = random.randint(1000, 9999)
-        self.unique_uuid = f"{self.BASE_HID_UUID[:-4]}{self.random_suffix:04x}"
         
         # Create unique paths
         self.AGENT_PATH = f"/org/bluez/agent/{self.pid}_{self.random_suffix}"
         self.HID_PATH = f"/org/bluez/hid/{self.pid}_{self.random_suffix}"
-        
-        # Initialize DBus
+
+        # Initialize DBus; the GLib main loop runs on its own thread, so
+        # dbus-python needs thread support enabled
+        dbus.mainloop.glib.threads_init()
         dbus.mainloop.glib.DBusGMainLoop(set_as_default=True)
         self.bus = None
         self.mainloop = GLib.MainLoop()
@@ -75,18 +190,62 @@ class BTHIDMouseService:
         signal.signal(signal.SIGINT, self.signal_handler)
         signal.signal(signal.SIGTERM, self.signal_handler)
         
-        # Initialize mouse input
-        pygame.init()
-        pygame.display.set_mode((1, 1))  # Tiny invisible window
+        # Read mouse input straight from the kernel: no SDL, no window,
+        # no display server needed
+        self.input_devices = find_mouse_devices()
+        if not self.input_devices:
+            logger.error("No mouse input devices found under /dev/input")
+            sys.exit(1)
+
+        # Preallocated HID report buffer, mutated in place on every send
+        # so the hot loop never allocates; byte 0 is the constant HIDP header
+        self._report = bytearray(4)
+        self._report[0] = HIDP_INPUT_REPORT
+        self._report_mv = memoryview(self._report)
+        if numpy is not None:
+            # numba kernels operate on ndarrays; this view shares the
+            # bytearray's memory, so sends still use the same buffer
+            self._report_view = numpy.frombuffer(self._report, dtype=numpy.uint8)
+        else:
+            self._report_view = self._report
+
+        # L2CAP channels to the connected host, populated on accept.
+        # Attach and teardown happen on the GLib mainloop thread while
+        # the sender thread is mid-send, so all channel state is
+        # guarded by _channel_lock
+        self.ctrl_sock = None
+        self.intr_sock = None
+        self._uring = None
+        self._channel_lock = threading.Lock()
+
+        # Coalesced input state shared between the capture thread and
+        # the sender thread: deltas accumulate until the sender drains
+        # them, so a stalled send never loses motion, only defers it
+        self._pending_dx = 0
+        self._pending_dy = 0
+        self._pending_buttons = 0
+        self._pending_lock = threading.Lock()
+        self._pending = threading.Event()
+        self._stop = threading.Event()
+        self._running = False
         
         logger.info(f"Starting HID Mouse Service (PID: {self.pid})")
         logger.info(f"Agent Path: {self.AGENT_PATH}")
         logger.info(f"HID Path: {self.HID_PATH}")
-        logger.info(f"Using UUID: {self.unique_uuid}")
+        logger.info(f"Using UUID: {self.BASE_HID_UUID}")
         
         # Setup Bluetooth services
         self.setup_services()
 
+        # dbus-python only dispatches incoming calls (Profile1
+        # NewConnection etc.) while the GLib main context iterates, and
+        # the capture loop occupies the main thread, so run the main
+        # loop on a thread of its own for the life of the service
+        self._mainloop_thread = threading.Thread(
+            target=self.mainloop.run, daemon=True
+        )
+        self._mainloop_thread.start()
+
     def run_bluetoothctl_command(self, command, timeout=5):
         """Execute bluetoothctl command and return output"""
         try:
@@ -107,40 +266,80 @@ class BTHIDMouseService:
             logger.error(f"Error running bluetoothctl: {e}")
             return ""
 
-    def ensure_bluetooth_service(self):
-        """Ensure Bluetooth service is running using bluetoothctl"""
+    def ensure_bluetooth_service(self, bus=None):
+        """Ensure the adapter is powered, discoverable and pairable.
+
+        Uses Adapter1 property calls on the existing DBus connection;
+        spawning bluetoothctl costs tens of ms per command and opens a
+        fresh DBus connection each time, so it is only kept as a
+        fallback for when no usable bus is available.
+        """
+        if bus is None:
+            bus = self.bus
+        if bus is not None:
+            try:
+                adapter = dbus.Interface(
+                    bus.get_object(self.BUS_NAME, self.ADAPTER_PATH),
+                    'org.freedesktop.DBus.Properties'
+                )
+                state = adapter.GetAll('org.bluez.Adapter1')
+                for name in ('Powered', 'Discoverable', 'Pairable'):
+                    if not state.get(name, False):
+                        logger.info(f"Enabling adapter property: {name}")
+                        adapter.Set('org.bluez.Adapter1', name, dbus.Boolean(True))
+                return True
+            except dbus.exceptions.DBusException as e:
+                logger.warning(f"Adapter configuration via DBus failed: {e}")
+        return self._ensure_bluetooth_service_ctl()
+
+    @staticmethod
+    def parse_controller_status(status):
+        """Parse bluetoothctl show output into a property dict"""
+        return dict(
+            line.strip().split(': ', 1)
+            for line in status.splitlines()
+            if ': ' in line
+        )
+
+    def _ensure_bluetooth_service_ctl(self):
+        """Fallback: configure the adapter through bluetoothctl"""
         try:
             # Check if Bluetooth service is active
             status = self.run_bluetoothctl_command("show")
             if "Controller" not in status:
                 logger.warning("Bluetooth service not responding. Restarting...")
                 subprocess.run(['sudo', 'systemctl', 'restart', 'bluetooth'], check=True)
-                time.sleep(2)  # Give service time to start
-            
+                wait_adapter_ready(timeout=5.0)
+                status = self.run_bluetoothctl_command("show")
+
+            # Parse the status output once instead of substring-scanning
+            # it for every property
+            props = self.parse_controller_status(status)
+
             # Ensure controller is powered on
-            if "Powered: no" in status:
+            if props.get('Powered') == 'no':
                 logger.info("Powering on Bluetooth controller")
                 self.run_bluetoothctl_command("power on")
                 time.sleep(1)
-            
+
             # Ensure controller is discoverable
-            if "Discoverable: no" in status:
+            if props.get('Discoverable') == 'no':
                 logger.info("Enabling discoverable mode")
                 self.run_bluetoothctl_command("discoverable on")
-            
+
             # Ensure controller is pairable
-            if "Pairable: no" in status:
+            if props.get('Pairable') == 'no':
                 logger.info("Enabling pairable mode")
                 self.run_bluetoothctl_command("pairable on")
-            
+
             # Enable agent
             self.run_bluetoothctl_command("agent on")
-            
+
             # Reset controller if needed
-            if "Discoverable: no" in status or "Pairable: no" in status:
+            if props.get('Discoverable') == 'no' or props.get('Pairable') == 'no':
                 self.run_bluetoothctl_command("scan off")
                 self.run_bluetoothctl_command("scan on")
-            
+
             return True
         except subprocess.CalledProcessError as e:
             logger.error(f"Bluetooth service management failed: {e}")
@@ -178,7 +377,14 @@ class BTHIDMouseService:
             self.profile_manager = dbus.Interface(
                 bluez_obj, 'org.bluez.ProfileManager1'
             )
-            
+
+            # Bring the adapter up (powered/discoverable/pairable) on
+            # the same connection before registering anything
+            self.ensure_bluetooth_service()
+
+            # Export the Profile1 object BlueZ hands connection fds to
+            self.profile = HIDProfile(self.bus, self.HID_PATH, self)
+
             # Register agent and profile with unique paths
             self.register_agent()
             self.register_profile()
@@ -210,13 +416,14 @@ class BTHIDMouseService:
             try:
                 logger.info(f"Registering profile (attempt {attempt+1}/3)")
                 self.profile_manager.RegisterProfile(
-                    self.HID_PATH, self.unique_uuid, {
+                    self.HID_PATH, self.BASE_HID_UUID, {
                         'Name': f'Python HID Mouse {self.random_suffix}',
                         'Role': 'server',
                         'RequireAuthentication': False,
                         'RequireAuthorization': False,
                         'AutoConnect': True,
-                        'ServiceRecord': self.get_sdp_record()
+                        # No ServiceRecord: BlueZ synthesizes the SDP
+                        # record for the registered HID UUID itself
                     }
                 )
                 self.profile_registered = True
@@ -237,53 +444,78 @@ class BTHIDMouseService:
         logger.error("Profile registration failed after 3 attempts")
         self.profile_registered = False
     
-    def get_sdp_record(self):
-        """Generate SDP record with unique identifiers"""
-        return dbus.String(f"""
-            <record>
-                <attribute id="0x0001">
-                    <sequence>
-                        <uuid value="{self.unique_uuid}"/>
-                    </sequence>
-                </attribute>
-                <attribute id="0x0004">
-                    <sequence>
-                        <sequence>
-                            <uuid value="0x0100"/>
-                        </sequence>
-                        <sequence>
-                            <uuid value="0x0011"/>
-                        </sequence>
-                    </sequence>
-                </attribute>
-                <attribute id="0x0005">
-                    <sequence>
-                        <uuid value="0x1002"/>
-                    </sequence>
-                </attribute>
-                <attribute id="0x0009">
-                    <sequence>
-                        <sequence>
-                            <uuid value="{self.unique_uuid}"/>
-                        </sequence>
-                    </sequence>
-                </attribute>
-                <attribute id="0x0100">
-                    <text value="Python HID Mouse {self.random_suffix}"/>
-                </attribute>
-                <attribute id="0x0101">
-                    <text value="Python Virtual Mouse {self.pid}"/>
-                </attribute>
-                <attribute id="0x0006">
-                    <sequence>
-                        <uint16 value="0x656e"/>
-                        <uint16 value="0x006a"/>
-                        <uint16 value="0x0100"/>
-                    </sequence>
-                </attribute>
-            </record>
-        """)
-        
+    def add_channel(self, device, sock):
+        """Attach an L2CAP channel handed over by BlueZ.
+
+        The host connects the control channel (PSM 0x11) first, then
+        the interrupt channel (PSM 0x13); the local PSM tells them
+        apart.
+        """
+        try:
+            psm = sock.getsockname()[1]
+        except OSError:
+            psm = None
+
+        with self._channel_lock:
+            if psm == PSM_INTR or (psm is None and self.ctrl_sock is not None):
+                logger.info(f"Interrupt channel connected: {device}")
+                sock.setblocking(False)
+                self._uring = uring.make_sender(sock.fileno())
+                self.intr_sock = sock
+            else:
+                logger.info(f"Control channel connected: {device}")
+                self.ctrl_sock = sock
+
+    def _close_client_sockets(self):
+        with self._channel_lock:
+            self._close_client_sockets_locked()
+
+    def _close_client_sockets_locked(self):
+        # Caller holds _channel_lock
+        if self._uring is not None:
+            try:
+                self._uring.close()
+            except OSError:
+                pass
+            self._uring = None
+        for sock in (self.ctrl_sock, self.intr_sock):
+            if sock is not None:
+                try:
+                    sock.close()
+                except OSError:
+                    pass
+        self.ctrl_sock = None
+        self.intr_sock = None
+
+    def send_hid_report(self, report):
+        """Send a HID input report on the L2CAP interrupt channel.
+
+        Holds the channel lock for the whole send: attach and teardown
+        run on the GLib mainloop thread, and neither a half-attached
+        channel nor a ring being closed mid-send must be observable
+        here. The lock is uncontended outside of (dis)connects.
+        """
+        with self._channel_lock:
+            sock = self.intr_sock
+            if sock is None:
+                return
+            try:
+                if self._uring is not None:
+                    self._uring.send(report)
+                    if not self._uring.dead:
+                        return
+                    logger.warning("HID connection lost")
+                else:
+                    sock.send(report, socket.MSG_DONTWAIT)
+                    return
+            except BlockingIOError:
+                # Kernel buffer full: drop the stale motion report
+                # rather than back-pressuring the mouse loop
+                return
+            except OSError as e:
+                logger.warning(f"HID connection lost: {e}")
+            self._close_client_sockets_locked()
+
     def run(self):
         """Main loop to capture mouse input"""
         if not self.profile_registered:
@@ -292,42 +524,138 @@ class BTHIDMouseService:
             
         logger.info("Mouse service running. Use Ctrl+C to stop.")
         logger.info("Make your device discoverable and pair with it from the target device.")
-        
-        prev_pos = pygame.mouse.get_pos()
-        
+
+        enable_realtime()
+
+        # Multiplex the device fds with epoll rather than select: O(1) in
+        # the number of registered fds and no 1024-fd ceiling. Edge-
+        # triggered, so each device is drained completely on every wakeup.
+        devices = {dev.fd: dev for dev in self.input_devices}
+        epoll = select.epoll()
+        for fd in devices:
+            os.set_blocking(fd, False)
+            epoll.register(fd, select.EPOLLIN | select.EPOLLET)
+
+        # SIGINT/SIGTERM write a byte to this pipe (set_wakeup_fd), so a
+        # signal ends an otherwise indefinite poll() immediately instead
+        # of waiting for the next bytecode boundary
+        wakeup_r, wakeup_w = os.pipe()
+        os.set_blocking(wakeup_r, False)
+        os.set_blocking(wakeup_w, False)
+        signal.set_wakeup_fd(wakeup_w)
+        epoll.register(wakeup_r, select.EPOLLIN)
+
+        # The sender thread paces and sends; this thread only captures,
+        # so a stalled Bluetooth send never delays the next mouse sample
+        sender = threading.Thread(target=self._sender_loop, daemon=True)
+        sender.start()
+
+        buttons = 0
+        self._running = True
+
         try:
-            while True:
-                time.sleep(0.01)  # Reduce CPU usage
-                
-                # Get current mouse state
-                curr_pos = pygame.mouse.get_pos()
-                left, middle, right = pygame.mouse.get_pressed()
-                
-                # Calculate delta movement
-                dx = max(-127, min(127, curr_pos[0] - prev_pos[0]))
-                dy = max(-127, min(127, curr_pos[1] - prev_pos[1]))
-                prev_pos = curr_pos
-                
-                # Pack HID report (buttons + dx/dy)
-                buttons = (left | (right << 1) | (middle << 2))
-                report = bytes([buttons, dx & 0xFF, dy & 0xFF])
-                
-                # In a real implementation, you would send this report to connected devices
-                if dx != 0 or dy != 0 or buttons != 0:
-                    logger.debug(f"Mouse report: buttons={buttons}, dx={dx}, dy={dy}")
+            while not self._stop.is_set():
+                # Block until input arrives or the signal pipe fires
+                ready = epoll.poll()
+
+                # Drain the ready devices and coalesce: a fast mouse can
+                # post hundreds of events per interval, but they all
+                # collapse into one summed delta + button state. Edge-
+                # triggered epoll only fires again after a full drain,
+                # so read until the fd would block.
+                dx_batch = dy_batch = 0
+                got_input = False
+                for fd, _ in ready:
+                    if fd == wakeup_r:
+                        os.read(wakeup_r, 16)  # drain; the handler set _stop
+                        continue
+                    got_input = True
+                    try:
+                        # One read() returns at most one kernel batch,
+                        # so keep reading until the fd would block —
+                        # only a full drain re-arms the EPOLLET edge
+                        while True:
+                            for e in devices[fd].read():
+                                if e.type == ecodes.EV_REL:
+                                    if e.code == ecodes.REL_X:
+                                        dx_batch += e.value
+                                    elif e.code == ecodes.REL_Y:
+                                        dy_batch += e.value
+                                elif e.type == ecodes.EV_KEY:
+                                    mask = BUTTON_MASKS.get(e.code)
+                                    if mask is not None:
+                                        if e.value:
+                                            buttons |= mask
+                                        else:
+                                            buttons &= ~mask
+                    except BlockingIOError:
+                        pass  # device drained
+
+                if not got_input:
+                    continue
+
+                # Publish to the sender thread
+                with self._pending_lock:
+                    self._pending_dx += dx_batch
+                    self._pending_dy += dy_batch
+                    self._pending_buttons = buttons
+                self._pending.set()
                 
         except KeyboardInterrupt:
             logger.info("Stopping mouse capture...")
         except Exception as e:
             logger.error(f"Unexpected error: {e}")
         finally:
+            self._running = False
+            self._stop.set()
+            sender.join(timeout=1)
+            signal.set_wakeup_fd(-1)
+            os.close(wakeup_r)
+            os.close(wakeup_w)
+            epoll.close()
             self.cleanup()
+
+    def _sender_loop(self):
+        """Drain the coalesced input state and send one report per interval"""
+        pack_report = _pack_report  # local bind for the hot loop
+        report_view = self._report_view
+        next_send = time.monotonic_ns()
+
+        while not self._stop.is_set():
+            if not self._pending.wait(timeout=0.1):
+                continue
+
+            # Pace reports to the BT connection interval with absolute
+            # deadlines, so the cadence tracks the interval exactly
+            # instead of accumulating scheduler jitter
+            now = time.monotonic_ns()
+            if next_send > now:
+                sleep_until(next_send)
+                next_send += REPORT_INTERVAL_NS
+            else:
+                # Idle gap: re-anchor rather than burst to catch up
+                next_send = now + REPORT_INTERVAL_NS
+
+            with self._pending_lock:
+                dx = self._pending_dx
+                dy = self._pending_dy
+                buttons = self._pending_buttons
+                self._pending_dx = self._pending_dy = 0
+                self._pending.clear()
+
+            # Clamp + pack (buttons + dx/dy) into the preallocated buffer
+            pack_report(dx, dy, buttons, report_view)
+            self.send_hid_report(self._report_mv)
             
     def signal_handler(self, signum, frame):
         """Handle system signals"""
         logger.info(f"Received signal {signum}, shutting down...")
-        self.cleanup()
-        sys.exit(0)
+        self._stop.set()
+        if not self._running:
+            # Not in the capture loop yet (e.g. during setup), so there
+            # is no wakeup pipe to unwind through: shut down directly
+            self.cleanup()
+            sys.exit(0)
         
     def cleanup(self):
         """Clean up resources"""
@@ -348,59 +676,94 @@ class BTHIDMouseService:
             except dbus.exceptions.DBusException as e:
                 logger.error(f"Agent unregister error: {e}")
             
-        # Clean up pygame
-        pygame.quit()
+        # Close L2CAP sockets
+        self._close_client_sockets()
+
+        # Close input devices
+        for dev in getattr(self, 'input_devices', []):
+            try:
+                dev.close()
+            except OSError:
+                pass
         
         # Stop main loop if running
         if hasattr(self, 'mainloop') and self.mainloop.is_running():
             self.mainloop.quit()
+        thread = getattr(self, '_mainloop_thread', None)
+        if thread is not None and thread.is_alive():
+            thread.join(timeout=1)
+
+def find_mouse_devices():
+    """Find input devices under /dev/input that report relative motion"""
+    devices = []
+    for path in list_devices():
+        try:
+            dev = InputDevice(path)
+        except OSError:
+            continue
+        caps = dev.capabilities()
+        if ecodes.REL_X in caps.get(ecodes.EV_REL, []):
+            logger.info(f"Capturing mouse input from {dev.path} ({dev.name})")
+            devices.append(dev)
+        else:
+            dev.close()
+    return devices
+
+# Idempotent bluetoothd configuration drop-in; written once, then left alone
+BLUETOOTH_CONF_DROPIN = '/etc/bluetooth/main.conf.d/99-hidmouse.conf'
 
 def setup_environment():
-    """Prepare the system environment for Bluetooth HID using bluetoothctl"""
-    logger.info("Preparing system environment with bluetoothctl...")
-    
+    """Prepare the system environment for Bluetooth HID"""
+    logger.info("Preparing system environment...")
+
     # Load required kernel modules
     subprocess.run(['sudo', 'modprobe', 'hidp'], check=False)
     subprocess.run(['sudo', 'modprobe', 'bluetooth'], check=False)
     subprocess.run(['sudo', 'modprobe', 'btusb'], check=False)
-    
-    # Enable Bluetooth experimental features
-    with open('/etc/bluetooth/main.conf', 'a') as f:
-        f.write("\n# Added by Python HID Mouse\n")
-        f.write("Experimental = true\n")
-        f.write("KernelExperimental = true\n")
-    
-    # Restart Bluetooth service
-    subprocess.run(['sudo', 'systemctl', 'restart', 'bluetooth'], check=True)
-    time.sleep(2)
-    
-    # Use bluetoothctl to configure the adapter
-    def run_ctl_command(cmd):
-        subprocess.run(
-            ['sudo', 'bluetoothctl', *cmd.split()],
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.DEVNULL
-        )
-    
-    # Configure Bluetooth controller
-    run_ctl_command("power on")
-    run_ctl_command("discoverable on")
-    run_ctl_command("pairable on")
-    run_ctl_command("agent on")
-    
-    # Show final status
-    result = subprocess.run(
-        ['sudo', 'bluetoothctl', 'show'],
-        capture_output=True,
-        text=True
-    )
-    logger.info("Bluetooth controller status:")
-    for line in result.stdout.splitlines():
-        if any(key in line for key in ["Powered", "Discoverable", "Pairable"]):
-            logger.info(f"  {line.strip()}")
-    
+
+    # Enable Bluetooth experimental features through a config drop-in
+    # instead of appending to main.conf on every run; bluetoothd only
+    # needs a restart the first time the file is created
+    if not os.path.exists(BLUETOOTH_CONF_DROPIN):
+        os.makedirs(os.path.dirname(BLUETOOTH_CONF_DROPIN), exist_ok=True)
+        with open(BLUETOOTH_CONF_DROPIN, 'w') as f:
+            f.write("# Added by Python HID Mouse\n")
+            f.write("[General]\n")
+            f.write("Experimental = true\n")
+            f.write("KernelExperimental = true\n")
+
+        # Restart Bluetooth service, then poll for readiness instead of
+        # a blind sleep: proceed the instant the adapter answers
+        subprocess.run(['sudo', 'systemctl', 'restart', 'bluetooth'], check=True)
+        if not wait_adapter_ready(timeout=5.0):
+            logger.warning("Bluetooth adapter not responding after restart")
+
+    # Adapter configuration (power/discoverable/pairable) happens over
+    # DBus in setup_services, on the service's own bus connection
+
     logger.info("Environment setup complete")
 
+def wait_adapter_ready(timeout=1.0):
+    """Poll the adapter over DBus until it answers, up to timeout seconds.
+
+    Replaces the fixed post-restart sleeps: polling Powered every 50 ms
+    lets startup continue as soon as bluetoothd is actually up.
+    """
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            adapter = dbus.Interface(
+                dbus.SystemBus().get_object(
+                    BTHIDMouseService.BUS_NAME, BTHIDMouseService.ADAPTER_PATH
+                ),
+                'org.freedesktop.DBus.Properties'
+            )
+            adapter.Get('org.bluez.Adapter1', 'Powered')
+            return True
+        except dbus.exceptions.DBusException:
+            time.sleep(0.05)
+    return False
+
 def get_bluetooth_address():
     """Get the Bluetooth MAC address using bluetoothctl"""
     try:
@@ -411,7 +774,7 @@ def get_bluetooth_address():
             check=True
         )
         # Extract MAC address from output
-        match = re.search(r'([0-9A-Fa-f]{2}[:]){5}([0-9A-Fa-f]{2})', result.stdout)
+        match = _MAC_RE.search(result.stdout)
         if match:
             return match.group(0)
         return "UNKNOWN"
@@ -0,0 +1,35 @@
+"""Standard mouse HID report descriptor.
+
+Kept as a bytes literal: adjacent literals are concatenated and folded
+into a single constant at compile time, so importing this module costs
+nothing beyond loading the code object.
+"""
+
+MOUSE_DESCRIPTOR = (
+    b"\x05\x01"  # Usage Page (Generic Desktop)
+    b"\x09\x02"  # Usage (Mouse)
+    b"\xA1\x01"  # Collection (Application)
+    b"\x09\x01"  #   Usage (Pointer)
+    b"\xA1\x00"  #   Collection (Physical)
+    b"\x05\x09"  #     Usage Page (Button)
+    b"\x19\x01"  #     Usage Minimum (1)
+    b"\x29\x03"  #     Usage Maximum (3)
+    b"\x15\x00"  #     Logical Minimum (0)
+    b"\x25\x01"  #     Logical Maximum (1)
+    b"\x95\x03"  #     Report Count (3)
+    b"\x75\x01"  #     Report Size (1)
+    b"\x81\x02"  #     Input (Data,Var,Abs)
+    b"\x95\x01"  #     Report Count (1)
+    b"\x75\x05"  #     Report Size (5)
+    b"\x81\x01"  #     Input (Const,Array,Abs)
+    b"\x05\x01"  #     Usage Page (Generic Desktop)
+    b"\x09\x30"  #     Usage (X)
+    b"\x09\x31"  #     Usage (Y)
+    b"\x15\x81"  #     Logical Minimum (-127)
+    b"\x25\x7F"  #     Logical Maximum (127)
+    b"\x75\x08"  #     Report Size (8)
+    b"\x95\x02"  #     Report Count (2)
+    b"\x81\x06"  #     Input (Data,Var,Rel)
+    b"\xC0"      #   End Collection
+    b"\xC0"      # End Collection
+)
@@ -0,0 +1,130 @@
+"""Optional io_uring send path for the L2CAP interrupt channel.
+
+With ``IORING_SETUP_SQPOLL`` the kernel polls the submission queue from
+a dedicated thread, so queueing a HID report does not issue a syscall at
+all — at high mouse polling rates this removes one ``send()`` syscall
+per report from the hot path. Requires the ``liburing`` bindings
+(``pip install 'mouse-controller[uring]'``); callers fall back to plain
+``socket.send()`` when they are missing or the kernel refuses the ring.
+"""
+
+import errno
+import logging
+import os
+
+try:
+    import liburing
+except ImportError:
+    liburing = None
+
+logger = logging.getLogger('BT_HID_Mouse')
+
+
+class UringSender:
+    """Submit socket sends through an io_uring SQPOLL ring.
+
+    Sends complete asynchronously, so each report is copied into a slot
+    from a small buffer ring; a slot is only reused after its completion
+    has been reaped, which keeps in-flight data immutable while the
+    caller keeps mutating its own report buffer.
+    """
+
+    QUEUE_DEPTH = 64
+
+    def __init__(self, fd):
+        self.fd = fd
+        self.dead = False  # set when a completion reports a socket error
+        self.ring = liburing.Ring()
+        liburing.io_uring_queue_init(
+            self.QUEUE_DEPTH, self.ring, liburing.IORING_SETUP_SQPOLL
+        )
+        self._cqe = liburing.Cqe()
+        # Slot buffers are sized to the report on first use, since
+        # prep_send takes its length from the buffer itself
+        self._bufs = [None] * self.QUEUE_DEPTH
+        self._free = list(range(self.QUEUE_DEPTH))
+
+        # SQPOLL requires registered files on older kernels, and it lets
+        # the kernel skip the per-op fd lookup either way. The FileIndex
+        # must stay referenced for the lifetime of the ring.
+        try:
+            self._file_index = liburing.FileIndex([fd])
+            liburing.io_uring_register_files(self.ring, self._file_index)
+            self._fd_index = 0
+        except (AttributeError, OSError, TypeError):
+            self._file_index = None
+            self._fd_index = None
+
+    def send(self, buf):
+        """Queue a send; with SQPOLL this never enters the kernel"""
+        self._reap()
+        if self.dead or not self._free:
+            # Dead socket or every slot in flight: drop, like
+            # MSG_DONTWAIT would. Checked before claiming an SQE — a
+            # claimed-but-unprepped entry would go to the kernel with
+            # stale contents on the next submit.
+            return
+        sqe = liburing.io_uring_get_sqe(self.ring)
+        if not sqe:
+            return  # submission queue full
+        slot = self._free.pop()
+        length = len(buf)
+        dest = self._bufs[slot]
+        if dest is None or len(dest) != length:
+            dest = self._bufs[slot] = bytearray(length)
+        dest[:] = buf
+        if self._fd_index is not None:
+            liburing.io_uring_prep_send(sqe, self._fd_index, dest)
+            sqe.flags |= liburing.IOSQE_FIXED_FILE
+        else:
+            liburing.io_uring_prep_send(sqe, self.fd, dest)
+        sqe.user_data = slot
+        try:
+            liburing.io_uring_submit(self.ring)
+        except OSError as e:
+            # The bindings surface socket errors from submit directly
+            # (e.g. EPIPE once the peer hung up); the slot is not
+            # returned since the SQE's fate is unknown, but the sender
+            # is dead anyway
+            self.dead = True
+            logger.debug(f"io_uring submit failed: {e}")
+
+    def _reap(self):
+        # Retire completed sends: return their slots to the free list
+        # and surface socket errors, so a disconnect is not silently
+        # papered over by endless queueing
+        while True:
+            try:
+                liburing.io_uring_peek_cqe(self.ring, self._cqe)
+            except BlockingIOError:
+                return  # completion queue drained
+            cqe = self._cqe[0]
+            try:
+                # The bindings raise the completion's error status as an
+                # OSError on access instead of returning a negative res
+                cqe.res
+            except OSError as e:
+                if e.errno != errno.EAGAIN:
+                    self.dead = True
+                    logger.debug(f"io_uring send failed: {e}")
+            self._free.append(cqe.user_data)
+            liburing.io_uring_cqe_seen(self.ring, cqe)
+
+    def close(self):
+        liburing.io_uring_queue_exit(self.ring)
+
+
+def make_sender(fd):
+    """Return a UringSender for fd, or None when io_uring is unavailable.
+
+    Any failure here must degrade to the plain socket path: raising out
+    of this function would propagate into Profile1.NewConnection and
+    lose the interrupt channel over an optional accelerator.
+    """
+    if liburing is None:
+        return None
+    try:
+        return UringSender(fd)
+    except Exception as e:
+        logger.warning(f"io_uring unavailable, falling back to send(): {e}")
+        return None